@@ -59,3 +59,6 @@ def main():
 
     except KeyboardInterrupt:
         ut.throw_error("Interrupted by user!")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,93 @@
 # Charge carrier mobility using Transient Localization Theory (TLT) and Marcus theory with KMC
 import numpy as np
+import atexit
+import os
 import sys
 import json
+from concurrent.futures import ProcessPoolExecutor
+from scipy.linalg import eigh
 from scipy.spatial import cKDTree
 
+try:
+    import numba
+except ImportError: # numba is an optional accelerator, fall back to numpy
+    numba = None
+
 hbar = 6.582e-16 # eV s
-kb = 8.6173e-5 # eV K-1  
+kb = 8.6173e-5 # eV K-1
 e = 1 # Charge on electron in eV/V
 
+_MOB_POOL = None # shared realization worker pool, created lazily by _get_pool()
+
+def _get_pool():
+    """ Return the shared worker pool, creating it on first use.
+    Keeping one module-level pool means repeated tlt_mobility calls (e.g.
+    temperature or disorder sweeps) don't pay process startup costs per call.
+    The pool is shut down automatically at interpreter exit.
+    """
+    global _MOB_POOL
+    if _MOB_POOL is None:
+        os.environ["OMP_NUM_THREADS"] = "1" # one BLAS thread per worker, avoid oversubscription
+        _MOB_POOL = ProcessPoolExecutor(max_workers=os.cpu_count())
+        atexit.register(_MOB_POOL.shutdown)
+    return _MOB_POOL
+
+def _accumulate_l2(mxX, mxY, energies, weights, htau2):
+    """ Reduce the position operator matrices to the squared localization lengths.
+    Sums (w_n + w_m) * (En-Em)^2 * |<n|x|m>|^2 * 2 / (htau^2 + (En-Em)^2)
+    over the upper triangle; the summand is symmetric under n <-> m and
+    vanishes on the diagonal, so this reproduces the full double sum.
+    Args:
+    mxX, mxY (np.array): position operator matrices in the eigenbasis
+    energies (np.array): eigenvalues of the Hamiltonian
+    weights (np.array): Boltzmann weights of the eigenstates
+    htau2 (float): squared inverse scattering time in eV^2
+    ----------------------------------------------
+    Return:
+    lx2, ly2 (float): unnormalized squared localization lengths
+    """
+    iu = np.triu_indices(len(energies), k=1)
+    eng_diff = energies[iu[0]] - energies[iu[1]]
+    # The weight/energy kernel is identical for x and y, so build it once and
+    # reuse it for both reductions
+    kernel = (weights[iu[0]] + weights[iu[1]]) * eng_diff**2 * 2 / (htau2 + eng_diff**2)
+    lx2 = np.sum(kernel * mxX[iu]**2, dtype=np.float64)
+    ly2 = np.sum(kernel * mxY[iu]**2, dtype=np.float64)
+
+    return lx2, ly2
+
+if numba is not None: # jit-compiled version, avoids the triangle index arrays and temporaries
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _accumulate_l2(mxX, mxY, energies, weights, htau2):
+        N = energies.shape[0]
+        lx2 = 0.0
+        ly2 = 0.0
+        for n in numba.prange(N):
+            for m in range(n + 1, N):
+                de = energies[n] - energies[m]
+                kernel = (weights[n] + weights[m]) * de * de * 2.0 / (htau2 + de * de)
+                lx2 += kernel * mxX[n, m]**2
+                ly2 += kernel * mxY[n, m]**2
+
+        return lx2, ly2
+
+def _localization_task(args):
+    """ Run a single disorder realization in a worker process.
+    Args:
+    args (tuple): (mobility, sites, gaussian, diag_eng) where mobility is the
+    Mobility instance, sites the supercell positions, and gaussian/diag_eng
+    this realization's pre-drawn disorder (drawn batched in the parent so
+    forked workers never touch the RNG)
+    ----------------------------------------------
+    Return:
+    lx2, ly2, ipr for this realization
+    """
+    mobility, sites, gaussian, diag_eng = args
+    lx2, ly2, eigenvecs = mobility.localization(sites, gaussian, diag_eng)
+    ipr = mobility.ipr(eigenvecs)
+
+    return lx2, ly2, ipr
+
 class Mobility():
     """
     Args:
@@ -27,40 +107,35 @@ class Mobility():
     def __init__(self, site=None, n=None, r=1, lattice=None, nearest_vecs=None, Lambda=0.0, Epsilon=0.0, j_ij=None, sigma_ii=0.0, sigma_ij=None, temp=298.0, inverse_htau=5e-3, is_hole=True, realizations=250, 
                  mob_file="mobility.json"):
         
+        defaults = {"site": site, "n": n, "r": r, "lattice": lattice,
+                    "nearest_vecs": nearest_vecs, "Lambda": Lambda, "Epsilon": Epsilon,
+                    "j_ij": j_ij, "sigma_ii": sigma_ii, "sigma_ij": sigma_ij,
+                    "temp": temp, "inverse_htau": inverse_htau, "is_hole": is_hole,
+                    "realizations": realizations}
+
         if mob_file:
             with open(mob_file, "r") as file:
                 config = json.load(file)
-            
-            self.site = np.array(config.get("site", site))
-            self.n = config.get("n", n)
-            self.r = config.get("r", r)
-            self.lattice = np.array(config.get("lattice", lattice))
-            self.nearest_vecs = config.get("nearest_vecs", nearest_vecs)
-            self.Lambda = config.get("Lambda", Lambda)
-            self.Epsilon = config.get("Epsilon", Epsilon)
-            self.j_ij = config.get("j_ij", j_ij)
-            self.sigma_ii = config.get("sigma_ii", sigma_ii)
-            self.sigma_ij = config.get("sigma_ij", sigma_ij)
-            self.temp = config.get("temp", temp)
-            self.inverse_htau = config.get("inverse_htau", inverse_htau)
-            self.is_hole = config.get("is_hole", is_hole)
-            self.realizations = config.get("realizations", realizations)
-
         else:
-            self.site = np.array(site)
-            self.n = n
-            self.r = r
-            self.lattice = np.array(lattice)
-            self.nearest_vecs = np.array(nearest_vecs)
-            self.Lambda = Lambda
-            self.Epsilon = Epsilon
-            self.j_ij = j_ij
-            self.sigma_ii = sigma_ii
-            self.sigma_ij = sigma_ij
-            self.temp = temp
-            self.inverse_htau = inverse_htau
-            self.is_hole = is_hole
-            self.realizations = realizations
+            config = {}
+
+        for key, default in defaults.items():
+            setattr(self, key, config.get(key, default))
+
+        # Array-typed fields
+        self.site = np.array(self.site)
+        self.lattice = np.array(self.lattice)
+        self.nearest_vecs = np.array(self.nearest_vecs)
+
+        # Signed Boltzmann factor: holes transport at the top edge of the
+        # valence band, so their weights grow with energy
+        self._signed_beta = (-1.0 if self.is_hole else 1.0) / (kb * self.temp)
+
+        # Caches for the disorder-independent pieces, filled once by precompute()
+        self._Hij_matrix = None
+        self._sigmaij_matrix = None
+        self._sites_cart = None
+        self._positions = None # supercell positions, filled by generate_lattice()
 
     def generate_lattice(self):
         '''
@@ -69,15 +144,12 @@ class Mobility():
         positions (np.array): containing the positions of the atoms in the
         simulation cell as rows, expressed in units of the lattice parameter.
         '''
-        n_in_cell = self.site.shape[0]
-        positions = np.zeros((n_in_cell * self.n * self.n, 2))
-    
-        count = 0
-        for a in range(self.n):
-            for b in range(self.n):
-                positions[count:(count + n_in_cell),] = self.site + [a, b]
-                count += n_in_cell
-        return positions
+        if self._positions is None:
+            # Tile the unit cell with one broadcast instead of a Python loop per
+            # cell; the result never changes, so cache it
+            offsets = np.stack(np.meshgrid(np.arange(self.n), np.arange(self.n), indexing='ij'), axis=-1).reshape(-1, 2)
+            self._positions = (offsets[:, None, :] + self.site[None, :, :]).reshape(-1, 2)
+        return self._positions
 
     def interaction(self, sites):
         """ 
@@ -91,62 +163,81 @@ class Mobility():
         dist_vecs (np.array): The distance vectors array
         """
         N = len(sites) # number of molecules in supercell
-        interaction_matrix = np.zeros((N, N), dtype=int)
+        interaction_matrix = np.zeros((N, N), dtype=np.int8) # values 0-3, keep the gather index small
 
         tree = cKDTree(sites, boxsize=self.n)
         neighbor_indices = tree.query_ball_tree(tree, 1)
         for i, neighbors in enumerate(neighbor_indices):
             neighbor_indices[i] = [j for j in neighbors if j != i] # remove self index
 
-        for i in range(N):
-            for j in neighbor_indices[i]:
-                dist = (sites[j] - sites[i])
-                values = self.check_neighbors(dist)
-                if values > 0:
-                    interaction_matrix[i][j] = values
-                else:
-                    interaction_matrix[i][j] = 0
+        # Classify all neighbor pairs in one vectorized pass instead of
+        # calling check_neighbors() per pair in the interpreter
+        ii = np.repeat(np.arange(N), [len(neighbors) for neighbors in neighbor_indices])
+        jj = np.concatenate([np.asarray(neighbors, dtype=int) for neighbors in neighbor_indices])
+        dist = sites[jj] - sites[ii]
+
+        wrap = np.any(np.abs(dist) > 1, axis=1) # sometimes PBC can make dist really large
+        dist[wrap] -= np.round(dist[wrap])
+
+        abs_dist = np.abs(dist)
+        near0 = np.all(np.isclose(abs_dist, self.nearest_vecs[0], atol=1e-5), axis=1)
+        near1 = np.all(np.isclose(abs_dist, self.nearest_vecs[1], atol=1e-5), axis=1)
+
+        values = np.zeros(len(ii), dtype=np.int8)
+        values[near0 & (dist[:,0] * dist[:,1] > 0)] = 1
+        values[near0 & (dist[:,0] * dist[:,1] <= 0)] = 3
+        values[near1] = 2
+        interaction_matrix[ii, jj] = values
 
         return interaction_matrix
 
-    def hamiltonian(self, sites):
+    def precompute(self, sites):
+        """ Build the disorder-independent pieces of the Hamiltonian.
+        The interaction matrix, the transfer integral matrix, the dynamic
+        disorder matrix and the Cartesian site positions only depend on the
+        supercell geometry, not on the random Gaussian, so they are computed
+        once and cached on the instance for reuse across realizations.
+        Args:
+        sites (np.array): The positions of the center for each molecule in the simulation cell
+        """
+        # Single precision throughout the eigh/matmul path: the disorder average
+        # over realizations dwarfs fp32 rounding, and it halves memory traffic
+        interaction_matrix = self.interaction(sites)
+
+        # One gather through a 4-entry lookup table per matrix replaces the
+        # copy, the float cast and the three boolean-mask passes
+        j_table = np.array([0.0, self.j_ij[0], self.j_ij[1], self.j_ij[2]], dtype=np.float32)
+        sigma_table = np.array([0.0, self.sigma_ij[0], self.sigma_ij[1], self.sigma_ij[2]], dtype=np.float32)
+
+        self._Hij_matrix = j_table[interaction_matrix] # Transfer integral matrix (J_ij)
+        self._sigmaij_matrix = sigma_table[interaction_matrix] # Dynamic disorder matrix (in TLT, we treat this as static disorder)
+        self._sites_cart = (sites @ self.lattice.T).astype(np.float32) # Back to Cartesian
+
+    def hamiltonian(self, sites, gaussian=None, diag_eng=None):
         """ Define the tight-binding Hamiltonian matrix for the charge carrier.
         H = H_el + H_ph + H_elph
         in original TLT: H_ph = 0, H_ii = 0; but we can add H_ii and H_elph,l
         H = (H_ii + H_elph,l) + H_ij + H_elph,nl
+        Args:
+        gaussian (np.array): pre-drawn symmetric Gaussian disorder matrix
+        (drawn here if not given)
+        diag_eng (np.array): pre-drawn site energies (drawn here if not given)
         ---------------------------------------------
         Return:
         H: Hamiltonian matrix
         """
-        interaction_matrix = self.interaction(sites)
-        Hij_matrix = np.copy(interaction_matrix).astype(float) # Transfer integral matrix (J_ij)
-        sigmaij_matrix = np.copy(interaction_matrix).astype(float) # Dynamic disorder matrix (in TLT, we treat this as static disorder)
+        if self._Hij_matrix is None:
+            self.precompute(sites)
 
         # Diagonal (H_ii)
-        diag_eng = np.random.normal(loc=self.Epsilon, scale=self.sigma_ii, size=len(sites))
+        if diag_eng is None:
+            diag_eng = np.random.normal(loc=self.Epsilon, scale=self.sigma_ii, size=len(sites)).astype(np.float32)
 
-        # Inter-molecular transfer integral matrix (H_ij)
-        j1 = self.j_ij[0]
-        j2 = self.j_ij[1]
-        j3 = self.j_ij[2]
+        if gaussian is None:
+            gaussian = np.random.normal(0, 1, size=self._Hij_matrix.shape).astype(np.float32)
+            gaussian = np.tril(gaussian) + np.tril(gaussian, -1).T
 
-        Hij_matrix[Hij_matrix==1] = j1
-        Hij_matrix[Hij_matrix==2] = j2
-        Hij_matrix[Hij_matrix==3] = j3
-
-        s1 = self.sigma_ij[0]
-        s2 = self.sigma_ij[1]
-        s3 = self.sigma_ij[2]
-
-        sigmaij_matrix[sigmaij_matrix==1] = s1
-        sigmaij_matrix[sigmaij_matrix==2] = s2
-        sigmaij_matrix[sigmaij_matrix==3] = s3
-
-        #np.random.seed(42)  # Ensures same random values each time
-        gaussian_matrix = np.random.normal(0, 1, size=interaction_matrix.shape)
-        gaussian_matrix = np.tril(gaussian_matrix) + np.tril(gaussian_matrix, -1).T
-    
-        H = Hij_matrix + sigmaij_matrix * gaussian_matrix
+        H = self._Hij_matrix + self._sigmaij_matrix * gaussian
         np.fill_diagonal(H, diag_eng)
 
         return H
@@ -164,10 +255,12 @@ class Mobility():
 
         return ipr
 
-    def localization(self, sites):
+    def localization(self, sites, gaussian=None, diag_eng=None):
         """
         Calculate the localization length of the charge carrier.
         Args:
+        gaussian (np.array): pre-drawn Gaussian disorder for hamiltonian()
+        diag_eng (np.array): pre-drawn site energies for hamiltonian()
         dist_vecs (np.array): The distance vectors array from interactions()
         interaction_matrix (np.array): The interaction matrix from interactions()
         inverse_htau (float): Inverse of the scattering time (hbar/tau) units in eV
@@ -178,28 +271,23 @@ class Mobility():
         ly2 (float): The localization length in y direction
         eigenvecs (np.array): The eigenvectors of the Hamiltonian matrix for IPR
         """
-        factor = -1
-        if not self.is_hole: # If hole transport, it will transport at the top edge of the valence band, Boltzmann factor will be positive
-            factor = 1
-
-        beta = 1 / (kb * self.temp) # Boltzmann factor 
-        h_ij = self.hamiltonian(sites) # Create Hamiltonian matrix
-        energies, eigenvecs = np.linalg.eigh(h_ij) # Solve eigenvalues & eigenvectors
-        sites = sites @ self.lattice.T # Back to Cartesian 
-        operx = np.diag(sites[:,0])
-        opery = np.diag(sites[:,1])
-        weights = np.exp(-factor * energies * beta)
+        h_ij = self.hamiltonian(sites, gaussian, diag_eng) # Create Hamiltonian matrix
+        # Solve eigenvalues & eigenvectors; h_ij is a fresh array per realization,
+        # so letting LAPACK overwrite it saves an O(N^2) copy per call
+        energies, eigenvecs = eigh(h_ij, driver='evr', overwrite_a=True, check_finite=False)
+        x = self._sites_cart[:,0] # position operators are diagonal, keep them as vectors
+        y = self._sites_cart[:,1]
+        # Boltzmann weights stay in double precision: exp(E*beta) under/overflows
+        # float32 for eV-scale energies at room temperature
+        weights = np.exp(-energies.astype(np.float64) * self._signed_beta)
         partition = np.sum(weights)
     
-        mxX = (eigenvecs.conj().T @ operx @ eigenvecs) # <n|x|m>, where x is the position operator
-        mxY = (eigenvecs.conj().T @ opery @ eigenvecs)
-
-        eng_diff = energies[:, None] - energies[None, :]
-        mxX *= eng_diff # (En-Em) * <n|x|m>
-        mxY *= eng_diff
+        # h_ij is real symmetric, so the eigenvectors are real and no conjugation
+        # is needed; scaling columns by x replaces the diag(x) matmul
+        mxX = (eigenvecs.T * x) @ eigenvecs # <n|x|m>, where x is the position operator
+        mxY = (eigenvecs.T * y) @ eigenvecs
 
-        lx2 = sum(sum(weights * (np.abs(mxX)**2) * 2 / (self.inverse_htau**2 + eng_diff**2)))
-        ly2 = sum(sum(weights * (np.abs(mxY)**2) * 2 / (self.inverse_htau**2 + eng_diff**2)))
+        lx2, ly2 = _accumulate_l2(mxX, mxY, energies, weights, self.inverse_htau**2)
 
         lx2 /= partition
         ly2 /= partition
@@ -230,19 +318,37 @@ class Mobility():
         avg_lx2 (float): The average square localization length in x direction
         avg_ly2 (float): The average square localization length in y direction
         """
+        # Deterministic limit: with no disorder every realization solves the
+        # same Hamiltonian, so one diagonalization gives the exact average
+        if self.sigma_ii == 0 and np.all(np.asarray(self.sigma_ij) == 0):
+            lx2, ly2, eigenvecs = self.localization(sites)
+            return lx2, ly2, self.ipr(eigenvecs)
+
         avglx2_list = []
         avgly2_list = []
         ipr_list = []
-        for n in range(self.realizations):
-            lx2, ly2, eigenvecs = self.localization(sites) # Calculation lx^2 and ly^2 
-            ipr = self.ipr(eigenvecs) # Calculate IPR
+        self.precompute(sites) # Build geometry-dependent matrices once, workers reuse them
+
+        # Draw the disorder for every realization in two batched calls and
+        # symmetrize the whole Gaussian batch at once
+        N = len(sites)
+        rng = np.random.default_rng()
+        all_gauss = rng.standard_normal((self.realizations, N, N), dtype=np.float32)
+        all_gauss = np.tril(all_gauss) + np.tril(all_gauss, -1).transpose(0, 2, 1)
+        if self.sigma_ii == 0: # no onsite disorder, every diagonal is just Epsilon
+            all_diag = np.full((self.realizations, N), self.Epsilon, dtype=np.float32)
+        else:
+            all_diag = rng.normal(self.Epsilon, self.sigma_ii, size=(self.realizations, N)).astype(np.float32)
+        tasks = [(self, sites, all_gauss[r], all_diag[r]) for r in range(self.realizations)]
+        executor = _get_pool()
+        for lx2, ly2, ipr in executor.map(_localization_task, tasks): # Each realization is independent, run them across cores
             ipr_list.append(ipr)
             avglx2_list.append(lx2)
             avgly2_list.append(ly2)
 
-        avglx2 = sum(avglx2_list) / self.realizations
-        avgly2 = sum(avgly2_list) / self.realizations
-        avgIPR = sum(ipr_list) / self.realizations
+        avglx2 = np.mean(avglx2_list, dtype=np.float64)
+        avgly2 = np.mean(avgly2_list, dtype=np.float64)
+        avgIPR = np.mean(ipr_list, dtype=np.float64)
 
         return avglx2, avgly2, avgIPR
 
@@ -401,15 +507,9 @@ class Mobility():
         Return:
         msd_vals: Mean square displacement array 
         """
-        N = len(traj)
-        msd_vals = np.zeros(N)
-
         traj_cart = np.array(traj) @ np.array(self.lattice).T # convert to cartesian
-
-        for tau in range(N):
-            disp = traj_cart[tau] - traj_cart[0] # displacement from initial position
-            squared_disp = np.sum(disp**2)
-            msd_vals[tau] = squared_disp
+        disp = traj_cart - traj_cart[0] # displacement from initial position
+        msd_vals = np.sum(disp**2, axis=1)
 
         return msd_vals
     